@@ -1,11 +1,14 @@
 import simpy
 import numpy as np
-import numpy.random as rand
 import logging
 import sys
+import heapq
+from collections import defaultdict, deque
+import kernels
 import ui
+from rng import AntitheticGenerator
 from facilities import Helipad, Artillery, ReconPlane
-from pieces import RWTarget, Target
+from pieces import RWTarget, RWGroup, Target
 
 loglevel = logging.INFO
 logging.basicConfig(level=loglevel, format='%(message)s')
@@ -17,16 +20,33 @@ log = logging.getLogger('StochasticGame')
 class Event:
     """
     An Event is anything that happens in the game. It is logged to the console and stored in the event queue.
+    The piece snapshot is captured lazily: it is only materialized if something reads .pieces.
+    Events accumulate in the event queue for a whole run, so they use __slots__ to
+    avoid paying for a per-instance __dict__.
     """
-    def __init__(self, piece, msg, time, pieces, logger=log.debug):
+    __slots__ = ('piece', 'msg', 'time', '_snapshot_fn', '_pieces', 'object_type', 'x', 'y')
+
+    def __init__(self, piece, msg, time, snapshot_fn=None, logger=log.debug, x=None, y=None):
         self.piece = piece
         self.msg = msg
         self.time = time
-        self.pieces = pieces
+        # Board coordinates the event refers to, stamped at emit time so
+        # consumers don't have to parse them back out of the message.
+        self.x = x
+        self.y = y
+        self._snapshot_fn = snapshot_fn
+        self._pieces = None
         self.object_type = type(self.piece).__name__
-        output = f'[{self.time:.2f}]: {self.object_type} {self.piece.id} {self.msg}'
         if logger:
-            logger(output)
+            # %-style args let the logging module skip formatting when the level is off
+            logger('[%.2f]: %s %s %s', self.time, self.object_type, self.piece.id, self.msg)
+
+    @property
+    def pieces(self):
+        if self._pieces is None and self._snapshot_fn is not None:
+            self._pieces = self._snapshot_fn()
+        return self._pieces
+
     def __str__(self):
         return f"[{self.time:.2f}]: {self.object_type} {self.piece.id} {self.msg}"
     def __repr__(self):
@@ -40,9 +60,18 @@ class GameEngine:
     """
     GameEngine is the main class responsible for running the game. It is responsible for managing the event queue, scheduling generators, and running the simulation.
     """
-    def __init__(self, size=100, resource_limit=100, real_time=False, simulation_mode=False):
+    def __init__(self, size=100, resource_limit=100, real_time=False, simulation_mode=False, keep_all_events=False, record_snapshots=False, seed=None, antithetic=False):
         self.env = simpy.rt.RealtimeEnvironment(strict=False) if real_time else simpy.Environment()
-        self.event_queue = []
+        # single PCG64 generator shared by the whole game; much lower per-draw
+        # overhead than the legacy MT19937 module-level functions, and seeding
+        # it here makes each engine instance independently reproducible.
+        # antithetic=True mirrors every draw, yielding the variance-reduction
+        # twin of the run with the same seed
+        self.rng = np.random.default_rng(seed)
+        if antithetic:
+            self.rng = AntitheticGenerator(self.rng)
+        # ring buffer: recent events only, so a long run can't grow this forever
+        self.event_queue = deque(maxlen=4096)
         self.size = size
         self.width = size * 2
         self.resource_limit = resource_limit
@@ -50,7 +79,29 @@ class GameEngine:
         self.piece_generators = []
         self.facility_generators = []
         self.possible_points = 0
+        self.pos_index = defaultdict(set)
+        self.y_index = defaultdict(set)
+        self._pos_snapshot = {}
+        self._callback_heap = []
+        self._callback_count = 0
+        self.game_over = False
+        # Structure-of-arrays mirror of per-piece state, indexed by piece._slot.
+        # Kept in sync by _register_slot / move_piece / remove_piece_pos so that
+        # bulk queries and batched moves can run as NumPy operations.
+        self._n_slots = 0
+        self._capacity = 0
+        self.pos_x = np.empty(0, dtype=np.int32)
+        self.pos_y = np.empty(0, dtype=np.int32)
+        self.piece_active = np.empty(0, dtype=bool)
+        self.piece_is_target = np.empty(0, dtype=bool)
+        self.piece_points = np.empty(0, dtype=np.int32)
         self.simulation_mode = simulation_mode
+        # Debug events are only kept when someone can see them: the console (debug
+        # logging on), the GUI (bridge subscribed), or an explicit opt-in here.
+        self.keep_all_events = bool(keep_all_events)
+        # nothing in the engine or UI reads Event.pieces, so snapshots are opt-in
+        self.record_snapshots = record_snapshots
+        self.debug_events_on = self.keep_all_events
         if self.simulation_mode:
             # kill all logging from this namespace
             log.handlers = []
@@ -63,9 +114,24 @@ class GameEngine:
         """
         self.points = 0
         self.pieces = pieces
+        self.active_targets = sum(1 for p in pieces.values() if p.target)
+        self._grow_arrays(max(64, 2 * len(pieces)))
+        rw_buckets = defaultdict(list)
         for p in self.pieces.values():
-            if p.runnable:
+            self._register_slot(p)
+            if p.target:
+                self.pos_index[p.get_pos()].add(p.id)
+                self.y_index[p.posy].add(p.id)
+            self._pos_snapshot[p.id] = p.get_pos()
+            if isinstance(p, RWTarget):
+                # random walkers sharing a speed are stepped together in one batch
+                rw_buckets[p.speed].append(p)
+            elif p.scheduled:
+                p.start()
+            elif p.runnable:
                 self.piece_generators.append(self.env.process(p.run()))
+        for speed, members in rw_buckets.items():
+            RWGroup(speed, members, self).start()
         self.facilities = facilities
         self.set_up = True
         return
@@ -77,83 +143,179 @@ class GameEngine:
         if piece.id in self.pieces:
             raise ValueError(f'Piece with id {piece.id} already exists')
         self.pieces[piece.id] = piece
-        if piece.runnable:
+        if piece.target:
+            self.active_targets += 1
+        self._register_slot(piece)
+        if piece.target:
+            self.pos_index[piece.get_pos()].add(piece.id)
+            self.y_index[piece.posy].add(piece.id)
+        self._pos_snapshot[piece.id] = piece.get_pos()
+        if piece.scheduled:
+            piece.start()
+        elif piece.runnable:
             self.piece_generators.append(self.env.process(piece.run()))
 
+    def _grow_arrays(self, capacity):
+        grow = lambda arr: np.concatenate([arr, np.zeros(capacity - len(arr), dtype=arr.dtype)])
+        self.pos_x = grow(self.pos_x)
+        self.pos_y = grow(self.pos_y)
+        self.piece_active = grow(self.piece_active)
+        self.piece_is_target = grow(self.piece_is_target)
+        self.piece_points = grow(self.piece_points)
+        self._capacity = capacity
+
+    def _register_slot(self, piece):
+        """
+        Assigns a piece a slot in the SoA state arrays and mirrors its state there.
+        """
+        if self._n_slots >= self._capacity:
+            self._grow_arrays(max(64, self._capacity * 2))
+        s = self._n_slots
+        self._n_slots += 1
+        piece._slot = s
+        self.pos_x[s] = piece.posx
+        self.pos_y[s] = piece.posy
+        self.piece_active[s] = piece.active
+        self.piece_is_target[s] = piece.target
+        self.piece_points[s] = getattr(piece, 'points', 0)
+
+    def schedule(self, delay, fn):
+        """
+        Schedules a callback to run after the given delay. Callbacks share a single
+        dispatcher process, which is much cheaper than one SimPy generator per piece
+        for pieces that only loop on a plain timeout.
+        """
+        self._callback_count += 1
+        heapq.heappush(self._callback_heap, (self.env.now + delay, self._callback_count, fn))
+
+    def _dispatch(self):
+        """
+        Drives the callback heap: sleeps until the next due callback, then runs
+        everything that is due.
+        """
+        heap = self._callback_heap
+        while heap and not self.game_over:
+            try:
+                yield self.env.timeout(heap[0][0] - self.env.now)
+            except simpy.Interrupt:
+                break
+            while heap and heap[0][0] <= self.env.now and not self.game_over:
+                _, _, fn = heapq.heappop(heap)
+                fn()
+
+    def move_piece(self, piece, posx, posy):
+        """
+        Moves a Piece to a new position, keeping the position indexes in sync.
+        Only targets are indexed, since the indexes exist to serve attacks.
+        """
+        if piece.target:
+            self.pos_index[(piece.posx, piece.posy)].discard(piece.id)
+            self.pos_index[(posx, posy)].add(piece.id)
+            if piece.posy != posy:
+                self.y_index[piece.posy].discard(piece.id)
+                self.y_index[posy].add(piece.id)
+        piece.posx = posx
+        piece.posy = posy
+        self._pos_snapshot[piece.id] = (posx, posy)
+        self.pos_x[piece._slot] = posx
+        self.pos_y[piece._slot] = posy
+
+    def remove_piece_pos(self, piece):
+        """
+        Removes a Piece from the position index (e.g. when it is destroyed).
+        """
+        self.pos_index[piece.get_pos()].discard(piece.id)
+        self.y_index[piece.posy].discard(piece.id)
+        self._pos_snapshot.pop(piece.id, None)
+        self.piece_active[piece._slot] = False
+
     def run(self):
         """
         Start the simulation. This function schedules the Piece and Facility generators and runs the simulation until the game ends.
         """
         if not self.set_up:
             raise RuntimeError("GameEngine.setup() must be called before GameEngine.run()")
+        # cache once per run so hot call sites can skip building event messages
+        # that would be dropped anyway
+        self.debug_events_on = (self.keep_all_events or log.isEnabledFor(logging.DEBUG)
+                                or ui.ui_event_bridge.has_subscribers())
         total_cost = 0
         total_cost = sum(f.resources for f in self.facilities.values())
         if total_cost > self.resource_limit:
             raise ValueError(f'Total resource cost ({total_cost}) exceeds resource limit ({self.resource_limit})')
         if not self.simulation_mode:
             print(f'Resources used: {total_cost}/{self.resource_limit}')
-        for p in self.pieces:
-            if hasattr(self.pieces[p], 'points'):
-                self.possible_points += self.pieces[p].points
-        for f in self.facilities:
-            if self.facilities[f].active():
-                self.facility_generators.append(self.env.process(self.facilities[f].run()))
-        self.env.process(self.endgame_check())
+        n = self._n_slots
+        self.possible_points += int(self.piece_points[:n][self.piece_is_target[:n]].sum())
+        for f in self.facilities.values():
+            if f.active():
+                if f.scheduled:
+                    f.start()
+                else:
+                    self.facility_generators.append(self.env.process(f.run()))
+        self._dispatcher = self.env.process(self._dispatch())
         if not self.simulation_mode:
             log.info(f'Game starting! Total possible points: {self.possible_points}')
-        self.env.run(until=100)
+        self._end_event = self.env.event()
+        self.env.run(until=self._end_event | self.env.timeout(100))
         if not self.simulation_mode:
             ui.ui_event_bridge.push_event(ui.EndGameEvent(self))
+            ui.ui_event_bridge.flush()
         if not self.simulation_mode:
             log.info(f'Game ended! Points: {self.points}/{self.possible_points}')
         for f in self.facilities.values():
             if f.active():
                 f.print_stats(log)
 
-    def endgame_check(self):
-        """
-        Ends the game if all Targets have been destroyed.
-        """
-        while True:
-            active_target = False
-            yield self.env.timeout(1)
-            for p in self.pieces.values():
-                if p.target and p.active:
-                    active_target = True
-                    break
-            if not active_target:
-                if not self.simulation_mode:
-                    log.info(f'[{self.env.now:.2f}] All targets destroyed, ending game')
-                    ui.ui_event_bridge.push_event(ui.EndGameEvent(self))
-                for fg in self.facility_generators:
-                    try:
-                        fg.interrupt()
-                    except RuntimeError:
-                        pass
-                for p in self.piece_generators:
-                    try:
-                        p.interrupt()
-                    except RuntimeError:
-                        pass
-                break
+    def target_destroyed(self):
+        """
+        Called by Target.hit. Ends the game as soon as the last Target dies,
+        without the old once-per-tick O(N) polling scan.
+        """
+        self.active_targets -= 1
+        if self.active_targets == 0:
+            self._terminate()
+
+    def _terminate(self):
+        """
+        Ends the game by triggering the end event that run() waits on. The
+        generators are simply abandoned mid-yield; no interrupts needed.
+        """
+        if self.game_over:
+            return
+        self.game_over = True
+        if not self.simulation_mode:
+            log.info(f'[{self.env.now:.2f}] All targets destroyed, ending game')
+            ui.ui_event_bridge.push_event(ui.EndGameEvent(self))
+        if not self._end_event.triggered:
+            self._end_event.succeed()
 
     def piece_snapshot(self):
         """
-        Creates a snapshot of the current state of the game. This is used to log events.
+        Returns a snapshot of the current state of the game. This is used to log events.
+        The snapshot is maintained incrementally as pieces move, so this is O(1).
         """
-        snap = {}
-        for p in self.pieces:
-            snap[p] = self.pieces[p].get_pos()
-        return snap
+        return self._pos_snapshot
 
-    def event(self, obj, msg, level=logging.DEBUG):
+    def event(self, obj, msg, level=logging.DEBUG, x=None, y=None):
         """
-        Log an event to the console and the event queue.
+        Log an event to the console and the event queue. Suppressed debug events are
+        dropped before any allocation happens.
         """
+        # Monte Carlo batch runs never look at events, so skip the Event
+        # allocation and queue append entirely; event() is the only producer,
+        # so this also keeps the queue empty across thousands of runs
+        if self.simulation_mode:
+            return
+        bridge = ui.ui_event_bridge
+        if level == logging.DEBUG and not self.debug_events_on:
+            return
         logger = log.debug if level == logging.DEBUG else log.info
-        e = Event(obj, msg, self.env.now, self.piece_snapshot(), logger)
+        snapshot_fn = self.piece_snapshot if self.record_snapshots else None
+        e = Event(obj, msg, self.env.now, snapshot_fn, logger, x, y)
         self.event_queue.append(e)
-        ui.ui_event_bridge.push_event(e)
+        if bridge.has_subscribers():
+            bridge.push_event(e)
         return
     
     def next_piece_id(self):
@@ -167,26 +329,41 @@ class GameEngine:
         """
         Returns a random position within the game board.
         """
-        return rand.randint(-self.size, self.size), rand.randint(-self.size, self.size)
+        # one PCG64 call for both coordinates; integers() keeps the exclusive
+        # upper bound of the old np draw
+        x, y = self.rng.integers(-self.size, self.size, size=2)
+        return int(x), int(y)
     
     def wrap_pos(self, posx, posy):
         """
         Ensures that the position is within the game board. If it is not, it wraps it around the board (Pac-Man style).
         """
-        new_posx = ((posx + self.size) % (self.width) + self.width) % self.width - self.size
-        new_posy = ((posy + self.size) % (self.width) + self.width) % self.width - self.size
-        return new_posx, new_posy
+        return kernels.wrap_pos(posx, posy, self.size, self.width)
     
     def attack_pos(self, attacker, posx, posy):
         """
         Check if a position is a target and if so, hit it.
         """
+        return self.attack_positions(attacker, ((posx, posy),))
+
+    def attack_positions(self, attacker, positions):
+        """
+        Hits every active target at each (x, y) in positions. Facilities that fire
+        a salvo (e.g. Artillery's antithetic pair) make one call for all shots so
+        the index and piece-table lookups are shared.
+        """
         earned_points = 0
-        for p in self.pieces:
-            if self.pieces[p].posx == posx and self.pieces[p].posy == posy:
-                if self.pieces[p].active and self.pieces[p].target:
-                    self.pieces[p].hit(attacker, log)
-                    earned_points += self.pieces[p].points
+        pos_index = self.pos_index
+        pieces = self.pieces
+        for pos in positions:
+            ids = pos_index.get(pos)
+            if not ids:
+                continue
+            for pid in list(ids):
+                p = pieces[pid]
+                if p.active and p.target:
+                    p.hit(attacker, log)
+                    earned_points += p.points
         return earned_points
     
 
@@ -1,8 +1,8 @@
 import simpy
 import logging
 import numpy as np
-import numpy.random as rand
 from pieces import Helicopter
+from rng import RNGBuffer
 
 ############# Facility Classes #############
 
@@ -12,19 +12,32 @@ class Facility:
     Facilities require resources. The more resources a facility has, the more frequently it will perform its action.
     Facilities that have no resources are inactive and are not scheduled to run.
     """
+    __slots__ = ('id', 'resources', 'game', 'env', 'earned_points', 'scheduled',
+                 'sim', 'rate', '_exp_buf')
+
     def __init__(self, id, resources, game):
         self.id = id
         self.resources = resources
         self.game = game
         self.env = game.env if game is not None else None
         self.earned_points = 0
+        self.scheduled = False
         self.sim = getattr(game, "simulation_mode", False)
 
     def run(self):
         raise NotImplementedError
-    
+
     def resource_cost(self):
         raise NotImplementedError
+
+    def _init_interarrival(self):
+        """
+        Prepares the batched exponential inter-arrival buffer. Subclasses call this
+        once self.rate is set; inactive facilities never draw, so they skip it.
+        """
+        if self.active():
+            rng = self.game.rng if self.game is not None else np.random
+            self._exp_buf = RNGBuffer(rng.exponential, 1024, 1/self.rate)
     
     def print_stats(self, log):
         if not self.sim:
@@ -38,27 +51,30 @@ class Artillery(Facility):
     """
     The Artillery is a Facility that fires at targets according to a Poisson process. One resource buys an expecation of one shot per time.
     """
+    __slots__ = ()
+
     def __init__(self, id, resources, game):
         super().__init__(id, resources, game)
         self.rate = resources
-
-    def run(self):
-        while True:
-            next = np.random.exponential(1/self.rate)
-            try:
-                yield self.env.timeout(next)
-            except simpy.Interrupt:
-                break
-            posx, posy = self.game.random_pos()
-            self.game.event(self, f'fired at ({posx}, {posy})')
-            self.earned_points += self.game.attack_pos(self, posx, posy)
-
-            # Antithetic variate: DAVID CODE
-            ax = -posx
-            ay = -posy
-            if not self.sim:
-                self.game.event(self, f'fired (antithetic) at ({ax}, {ay})')
-            self.earned_points += self.game.attack_pos(self, ax, ay)
+        self.scheduled = True
+        self._init_interarrival()
+
+    def start(self):
+        self.game.schedule(self._exp_buf.next(), self.step)
+
+    def step(self):
+        posx, posy = self.game.random_pos()
+
+        # Antithetic variate: DAVID CODE
+        ax = -posx
+        ay = -posy
+        # debug-level messages are dropped unless something listens, so don't
+        # even build the f-strings in that case
+        if self.game.debug_events_on:
+            self.game.event(self, f'fired at ({posx}, {posy})', x=posx, y=posy)
+            self.game.event(self, f'fired (antithetic) at ({ax}, {ay})', x=ax, y=ay)
+        self.earned_points += self.game.attack_positions(self, ((posx, posy), (ax, ay)))
+        self.game.schedule(self._exp_buf.next(), self.step)
 
     def resource_cost(self):
         return self.rate
@@ -68,6 +84,8 @@ class Helipad(Facility):
     """
     The Helipad is a Facility that spawns Helicopters according to a Poisson process. One resource buys an expecation of one helicopter per 0.025 time.
     """
+    __slots__ = ('_RESOURCE_MULTIPLIER', 'alpha')
+
     def __init__(self, id, resources, game, alpha):
         super().__init__(id, resources, game)
         self._RESOURCE_MULTIPLIER = 0.025
@@ -75,20 +93,25 @@ class Helipad(Facility):
         if not 0 < alpha <= 2:
             raise ValueError("Lévy exponent 'alpha' must be between 0 and 2.")
         self.alpha = alpha
+        self._init_interarrival()
 
     def run(self):
-        while True:
-            next = np.random.exponential(1/self.rate)
+        game = self.game
+        timeout = self.env.timeout
+        next_interarrival = self._exp_buf.next
+        while not game.game_over:
             try:
-                yield self.env.timeout(next)
+                yield timeout(next_interarrival())
             except simpy.Interrupt:
                 break
-            posx, posy = self.game.random_pos()
-            id = self.game.next_piece_id()
-            h = Helicopter(id, posx, posy, self.game, self.alpha, 1, self)
-            self.game.add_piece(h)
+            if game.game_over:
+                break
+            posx, posy = game.random_pos()
+            id = game.next_piece_id()
+            h = Helicopter(id, posx, posy, game, self.alpha, 1, self)
+            game.add_piece(h)
             if not self.sim:
-                self.game.event(self, f'spawned Helicopter {id} at ({posx}, {posy})', level=logging.INFO)
+                game.event(self, f'spawned Helicopter {id} at ({posx}, {posy})', level=logging.INFO)
 
 class ReconPlane(Facility): #DAVID CODE
     """
@@ -97,6 +120,8 @@ class ReconPlane(Facility): #DAVID CODE
     destroys any targets in that band.
     This demonstrates stratified sampling over the y-coordinate.
     """
+    __slots__ = ('_RESOURCE_MULTIPLIER', 'sample_rate', 'n_strata', 'current_stratum')
+
     def __init__(self, id, resources, game, n_strata=4):
         super().__init__(id, resources, game)
         self._RESOURCE_MULTIPLIER = 0.02
@@ -104,38 +129,61 @@ class ReconPlane(Facility): #DAVID CODE
         self.sample_rate = resources * self._RESOURCE_MULTIPLIER
         self.n_strata = n_strata
         self.current_stratum = 0
+        self._init_interarrival()
 
     def run(self):
         """
         Run the ReconPlane facility. Scans happen according to a Poisson process.
         Each scan hits all targets in the selected horizontal band.
         """
-       
-        while True:
-            next_t = np.random.exponential(1 / self.rate)
+        game = self.game
+        timeout = self.env.timeout
+        next_interarrival = self._exp_buf.next
+        event = game.event
+        attack = game.attack_pos
+        size = game.size
+        band_height = int((2 * size) / self.n_strata)
+        width = 2 * size + 1
+        # per-column hit probability; manual games can push resources past
+        # the point where every column is scanned, so cap at 1
+        p_col = min(1.0, self.sample_rate)
+        while not game.game_over:
             try:
-                yield self.env.timeout(next_t)
+                yield timeout(next_interarrival())
             except simpy.Interrupt:
                 break
+            if game.game_over:
+                break
 
-            band_height = int((2 * self.game.size) / self.n_strata)
             s = self.current_stratum
             self.current_stratum = (self.current_stratum + 1) % self.n_strata
 
-            y_min = -self.game.size + s * band_height
+            y_min = -size + s * band_height
             y_max = y_min + band_height
 
-            scan_y = rand.randint(int(y_min), int(y_max) + 1)
+            scan_y = int(game.rng.integers(int(y_min), int(y_max) + 1))
 
             if not self.sim:
-                self.game.event(
+                event(
                     self,
                     f'began scanning horizontal band y={scan_y}',
                     level=logging.INFO
                 )
 
-            for i in range(-self.game.size, self.game.size + 1):
-                r = rand.uniform(0, 1)
-                if r < self.sample_rate:
-                    self.game.event(self, f'attacked ({i}, {scan_y})')
-                    self.earned_points += self.game.attack_pos(self, i, scan_y)
\ No newline at end of file
+            # exactly equivalent to a Bernoulli trial per column: the hit
+            # count is Binomial(width, p) and the hit columns are distinct,
+            # two RNG calls instead of one uniform per column
+            k = game.rng.binomial(width, p_col)
+            hit_xs = game.rng.choice(width, size=k, replace=False) - size
+            if game.debug_events_on:
+                for i in hit_xs:
+                    event(self, f'attacked ({int(i)}, {scan_y})', x=int(i), y=scan_y)
+            # only pieces in the scanned row can be hit; the y-index keeps this
+            # O(pieces in band) instead of O(width) attack_pos calls
+            candidates = game.y_index.get(scan_y)
+            if candidates:
+                hit_x_set = set(hit_xs.tolist())
+                for pid in list(candidates):
+                    p = game.pieces[pid]
+                    if p.active and p.target and p.posx in hit_x_set:
+                        self.earned_points += attack(self, p.posx, scan_y)
\ No newline at end of file
@@ -1,16 +1,26 @@
 import simpy
 import numpy as np
-import numpy.random as rand
 import logging
+from rng import RNGBuffer
+import kernels
 
 ############# Piece Classes #############
 
+# (dx, dy) per random-walk direction; indexed instead of branching on the draw.
+_RW_DELTAS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_RW_DELTAS_ARR = np.array(_RW_DELTAS, dtype=np.int32)
+
 class Piece:
     """
     A Piece is an entity that exists on the game board.
     Pieces which are targets can be hit by attacks and destroyed.
     Pieces which are runnable are generators which can be scheduled to run and perform some action, such as moving.
+    Pieces which are scheduled instead register a step() callback with the engine's
+    shared dispatcher, which is cheaper than a dedicated generator.
     """
+    __slots__ = ('id', 'posx', 'posy', 'game', 'active', 'env', 'runnable',
+                 'scheduled', 'target', '_slot')
+
     def __init__(self, id, posx, posy, game):
         self.id = id
         self.posx = posx
@@ -19,7 +29,9 @@ class Piece:
         self.active = True
         self.env = game.env if game is not None else None
         self.runnable = False
+        self.scheduled = False
         self.target = False
+        self._slot = None  # index into the engine's SoA state arrays
     def get_pos(self):
         return (self.posx, self.posy)
     
@@ -30,6 +42,8 @@ class Target(Piece):
     """
     A Target is a piece that can be hit by attacks and destroyed, granting points.
     """
+    __slots__ = ('points',)
+
     def __init__(self, id, posx, posy, game, points):
         super().__init__(id, posx, posy, game)
         self.points = points
@@ -40,50 +54,82 @@ class Target(Piece):
         This function is called when the Target is hit by an attack.
         """
         self.active = False
+        self.game.remove_piece_pos(self)
         self.game.points += self.points
+        self.game.target_destroyed()
         if not self.game.simulation_mode:
             self.game.event(self, f'destroyed by {type(attacker).__name__} {attacker.id}', level=logging.INFO)
-            log.debug(f'[{self.game.env.now:.2f}]: {self.points} points gained, {self.game.points}/{self.game.possible_points} possible points earned')
+            log.debug('[%.2f]: %d points gained, %d/%d possible points earned',
+                      self.game.env.now, self.points, self.game.points, self.game.possible_points)
 
 class RWTarget(Target):
     """
     A RWTarget is a Target that moves around the map according to a random walk.
     """
+    __slots__ = ('speed', '_dir_buf')
+
     def __init__(self, id, posx, posy, game, points, speed):
         super().__init__(id, posx, posy, game, points)
         self.points = points
         self.speed = speed
-        self.runnable = True
-    
-    def run(self):
-        while self.active:
-            try:
-                yield self.env.timeout(self.speed)
-            except simpy.Interrupt:
-                break
-            if not self.active:
-                break
-            direction = rand.randint(0, 3)
-            if direction == 0:
-                self.posx += 1
-            elif direction == 1:
-                self.posx -= 1
-            elif direction == 2:
-                self.posy += 1
-            elif direction == 3:
-                self.posy -= 1
-            if self.posx < -self.game.size:
-                self.posx = self.game.size
-            if self.posx > self.game.size:
-                self.posx = -self.game.size
-            self.posx, self.posy = self.game.wrap_pos(self.posx, self.posy)
-            if not self.game.simulation_mode:
-                self.game.event(self, f'moved to ({self.posx}, {self.posy})')
+        self.scheduled = True
+
+    def start(self):
+        # setup() batches walkers through RWGroup, which draws its own
+        # directions; only individually started walkers pay for this buffer
+        self._dir_buf = RNGBuffer(self.game.rng.integers, 1024, 0, 3)
+        self.game.schedule(self.speed, self.step)
+
+    def step(self):
+        if not self.active:
+            return
+        dx, dy = _RW_DELTAS[self._dir_buf.next()]
+        self.game.move_piece(self, *self.game.wrap_pos(self.posx + dx, self.posy + dy))
+        if self.game.debug_events_on:
+            self.game.event(self, f'moved to ({self.posx}, {self.posy})', x=self.posx, y=self.posy)
+        self.game.schedule(self.speed, self.step)
+
+class RWGroup:
+    """
+    Moves all RWTargets that share a speed in one batched step: a single scheduled
+    callback draws every member's direction at once and applies the wrapped deltas
+    through the engine's SoA arrays, instead of one generator and one scalar draw
+    per target.
+    """
+    def __init__(self, speed, members, game):
+        self.id = f'speed-{speed}'
+        self.speed = speed
+        self.members = members
+        self.game = game
+
+    def start(self):
+        self.game.schedule(self.speed, self.step)
+
+    def step(self):
+        game = self.game
+        live = [p for p in self.members if p.active]
+        self.members = live  # destroyed walkers never come back; drop them for good
+        if not live or game.game_over:
+            return
+        n = len(live)
+        dirs = game.rng.integers(0, 3, size=n)
+        slots = np.fromiter((p._slot for p in live), dtype=np.intp, count=n)
+        deltas = _RW_DELTAS_ARR[dirs]
+        new_x = (game.pos_x[slots] + deltas[:, 0] + game.size) % game.width - game.size
+        new_y = (game.pos_y[slots] + deltas[:, 1] + game.size) % game.width - game.size
+        for i, p in enumerate(live):
+            game.move_piece(p, int(new_x[i]), int(new_y[i]))
+        if game.debug_events_on:
+            game.event(self, f'moved {n} targets')
+        game.schedule(self.speed, self.step)
+
 
 class Helicopter(Piece):
     """
     A helicopter that moves around the map according to a Levy flight, destroying targets it lands on.
     """
+    __slots__ = ('alpha', 'speed', 'parent', '_dx', '_dy', '_step_i')
+
     def __init__(self, id, posx, posy, game, alpha, speed, parent):
         super().__init__(id, posx, posy, game)
         self.active = True
@@ -91,22 +137,31 @@ class Helicopter(Piece):
         self.alpha = alpha
         self.speed = speed
         self.parent = parent
+        # whole trajectory of Lévy jumps pre-sampled in one vectorized draw
+        self._dx, self._dy = kernels.gen_levy_steps(alpha, 1024, game.rng)
+        self._step_i = 0
 
     def run(self):
-        while self.active:
+        game = self.game
+        timeout = self.env.timeout
+        attack = game.attack_pos
+        wrap = kernels.wrap_pos
+        size = game.size
+        width = game.width
+        while self.active and not game.game_over:
             try:
-                yield self.env.timeout(self.speed)
+                yield timeout(self.speed)
             except simpy.Interrupt:
                 break
-            if not self.active:
+            if not self.active or game.game_over:
                 break
-            angle = rand.uniform(0, 2 * np.pi)
-            length = L = rand.uniform(0.0001, 1.0)**(-1.0 / self.alpha)
-            j_x_float = L * np.cos(angle)
-            j_y_float = L * np.sin(angle)
-            j_x = int(np.round(j_x_float))
-            j_y = int(np.round(j_y_float))
-            self.posx, self.posy = self.game.wrap_pos(self.posx + j_x, self.posy + j_y)
-            if not self.game.simulation_mode:
-                self.game.event(self, f'moved to ({self.posx}, {self.posy})')
-            self.parent.earned_points += self.game.attack_pos(self, self.posx, self.posy)
\ No newline at end of file
+            if self._step_i >= len(self._dx):
+                self._dx, self._dy = kernels.gen_levy_steps(self.alpha, 1024, game.rng)
+                self._step_i = 0
+            j_x = int(self._dx[self._step_i])
+            j_y = int(self._dy[self._step_i])
+            self._step_i += 1
+            game.move_piece(self, *wrap(self.posx + j_x, self.posy + j_y, size, width))
+            if game.debug_events_on:
+                game.event(self, f'moved to ({self.posx}, {self.posy})', x=self.posx, y=self.posy)
+            self.parent.earned_points += attack(self, self.posx, self.posy)
\ No newline at end of file
@@ -1,43 +1,132 @@
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+import os
 import numpy as np
-import matplotlib.pyplot as plt
 from tqdm import tqdm
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from engine import GameEngine
 from facilities import Artillery, Helipad, ReconPlane
 from pieces import RWTarget, Target
-import ui
+import kernels
 import pickle
 from pathlib import Path
 import sys
-from collections import Counter
-from scipy.stats import norm
 ARTILLERY_COLOR = "#db3434"
 HELICOPTER_COLOR = "#cdd331"
 RECON_PLANE_COLOR = "#1818C3"
 
-ui.ui_event_bridge.push_event = lambda *args, **kwargs: None
+# compile the Numba kernels (if available) before any run is timed
+kernels.warmup()
 
+# One worker pool for the whole process. The optimizers call run_parallel
+# thousands of times; spinning up a fresh pool each call pays fork and
+# re-import costs that dwarf the simulations themselves.
+_POOL = None
+_POOL_WORKERS = None
 
-def build_game(difficulty, artillery_res, helipad_res, recon_res, seed=42):
-    np.random.seed(seed)
 
+def _init_worker():
+    """
+    Runs once per worker at spawn: pull in the heavy modules and compile the
+    Numba kernels up front, so the first real task doesn't pay import or JIT
+    latency.
+    """
+    import engine, facilities, pieces  # noqa: F401
+    kernels.warmup()
+
+
+def _get_pool(max_workers=None):
+    """
+    Lazily creates the shared ProcessPoolExecutor, reusing it across calls.
+    A new pool is only built if a different max_workers is requested.
+    Workers fork where available (inheriting the parent's already-imported
+    modules) and run _init_worker before accepting tasks.
+    """
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or (max_workers is not None and max_workers != _POOL_WORKERS):
+        if _POOL is not None:
+            _POOL.shutdown()
+        ctx = None
+        if 'fork' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('fork')
+        _POOL = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=ctx,
+            initializer=_init_worker
+        )
+        _POOL_WORKERS = max_workers
+    return _POOL
+
+
+def _shutdown_pool():
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown()
+        _POOL = None
+
+
+atexit.register(_shutdown_pool)
+
+
+class DiskCache:
+    """
+    Dict-like memo cache persisted to a pickle under sim_data/. The optimizers
+    key entries by (difficulty, n_sim, a, h, r); since every evaluation uses a
+    fixed seed list the mean score is deterministic, so a re-run after a crash
+    (or on another optimizer) skips run_parallel entirely for known states.
+    """
+    def __init__(self, filename="sim_data/mean_score_cache.pkl", flush_every=10):
+        self.path = Path(filename)
+        self.data = {}
+        if self.path.exists():
+            with self.path.open("rb") as f:
+                self.data = pickle.load(f)
+        self.flush_every = flush_every
+        self._dirty = 0
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+        self._dirty += 1
+        if self._dirty >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._dirty == 0:
+            return
+        self.path.parent.mkdir(exist_ok=True)
+        with self.path.open("wb") as f:
+            pickle.dump(self.data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._dirty = 0
+
+
+def build_game(difficulty, artillery_res, helipad_res, recon_res, seed=42, antithetic=False):
+    # all randomness flows through the engine's own PCG64 generator, so
+    # seeding the engine is enough to make the whole run reproducible
     game = GameEngine(
         size=difficulty * 20,
         resource_limit=50,
         real_time=False,
-        simulation_mode=True
+        simulation_mode=True,
+        seed=seed,
+        antithetic=antithetic
     )
 
     # Pieces
     pieces = {}
 
+    # one vectorized draw for every initial placement instead of a scalar
+    # random_pos call per piece
+    pos = game.rng.integers(-game.size, game.size, size=(60, 2))
+
     for speed, i in enumerate(range(100000, 100010)):
-        posx, posy = game.random_pos()
-        pieces[i] = RWTarget(i, posx, posy, game, 5, speed + 1)
+        pieces[i] = RWTarget(i, int(pos[speed, 0]), int(pos[speed, 1]), game, 5, speed + 1)
 
-    for i in range(100010, 100060):
-        posx, posy = game.random_pos()
-        pieces[i] = Target(i, posx, posy, game, 1)
+    for j, i in enumerate(range(100010, 100060), start=10):
+        pieces[i] = Target(i, int(pos[j, 0]), int(pos[j, 1]), game, 1)
 
     # Facilities
     facilities = {
@@ -55,30 +144,121 @@ def build_game(difficulty, artillery_res, helipad_res, recon_res, seed=42):
     return game
 
 
-def run_single_simulation(difficulty, a, h, r, seed):
-    game = build_game(difficulty, a, h, r, seed)
+def run_single_simulation(difficulty, a, h, r, seed, antithetic=False):
+    game = build_game(difficulty, a, h, r, seed, antithetic)
     game.run()
     return game.points
 
 
-def run_parallel(difficulty, a, h, r, base_seed, n_sim, max_workers=None):
+def _run_single_star(args):
+    """Unpacks one (difficulty, a, h, r, seed) job for executor.map."""
+    return run_single_simulation(*args)
+
+
+def run_batch(difficulty, a, h, r, seeds, antithetic=False):
     """
-    Executes n_sim simulations in parallel.
-    Returns an array of final scores.
+    Runs one simulation per seed in-process and returns their scores.
+    Workers loop internally so the pool ships one task per chunk of seeds
+    instead of one pickle/dispatch/result round-trip per simulation.
     """
-    seeds = [base_seed + k for k in range(n_sim)]
-    args = [(difficulty, a, h, r, s) for s in seeds]
+    return np.fromiter(
+        (run_single_simulation(difficulty, a, h, r, s, antithetic) for s in seeds),
+        dtype=np.float64,
+        count=len(seeds)
+    )
 
-    scores = []
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # submit work
-        futures = [executor.submit(run_single_simulation, *arg) for arg in args]
 
-        # wrap in tqdm progress bar
-        for f in tqdm(futures):
-            scores.append(f.result())
+def _run_batch_shm(shm_name, offset, difficulty, a, h, r, seeds, antithetic=False):
+    """
+    run_batch variant that writes its scores straight into the shared result
+    buffer at the given element offset instead of pickling an array back.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((len(seeds),), dtype=np.float64, buffer=shm.buf,
+                         offset=offset * 8)
+        for i, s in enumerate(seeds):
+            out[i] = run_single_simulation(difficulty, a, h, r, s, antithetic)
+    finally:
+        shm.close()
+
 
-    return np.array(scores)
+def run_parallel(difficulty, a, h, r, base_seed, n_sim, max_workers=None, antithetic=False):
+    """
+    Executes n_sim simulations in parallel. Workers write their scores into a
+    shared-memory buffer, so nothing comes back over the result pipe but a
+    completion signal.
+    Returns an array of final scores. With antithetic=True, n_sim//2 seeds are
+    each run twice — once normally, once with every uniform mirrored — and the
+    pairs are averaged, so the returned array holds n_sim//2 pair means and its
+    sample variance (ddof=1) already carries the paired degrees of freedom.
+    """
+    executor = _get_pool(max_workers)
+    n_runs = n_sim // 2 if antithetic else n_sim
+    seeds = [base_seed + k for k in range(n_runs)]
+
+    # one chunk of seeds per worker keeps the task count at nprocs, not n_sim
+    n_chunks = min(n_runs, max_workers or os.cpu_count() or 1)
+    chunks = np.array_split(np.asarray(seeds), n_chunks)
+
+    variants = (False, True) if antithetic else (False,)
+    total = n_runs * len(variants)
+    shm = shared_memory.SharedMemory(create=True, size=max(8, total * 8))
+    try:
+        futures = []
+        for v, variant in enumerate(variants):
+            offset = v * n_runs  # primary scores first, then the twin block
+            for chunk in chunks:
+                futures.append(executor.submit(
+                    _run_batch_shm, shm.name, offset,
+                    difficulty, a, h, r, chunk.tolist(), variant
+                ))
+                offset += len(chunk)
+
+        # consume in completion order so a slow chunk doesn't block progress;
+        # the offsets keep the buffer in seed order
+        for fut in tqdm(as_completed(futures), total=len(futures)):
+            fut.result()
+
+        scores = np.ndarray((total,), dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if antithetic:
+        return 0.5 * (scores[:n_runs] + scores[n_runs:])
+    return scores[:n_runs]
+
+
+def run_adaptive(difficulty, a, h, r, base_seed, max_sim, tol=0.5, min_sim=20,
+                 batch=10, max_workers=None):
+    """
+    Sequential sampling: runs replications in batches and stops as soon as the
+    95% CI half-width of the mean drops below tol (after at least min_sim
+    runs), instead of always spending max_sim. Welford's online update tracks
+    the running mean and variance without keeping the score array.
+    Returns (mean, variance, n_used).
+    """
+    executor = _get_pool(max_workers)
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    while n < max_sim:
+        k = min(batch, max_sim - n)
+        seeds = np.asarray([base_seed + n + j for j in range(k)])
+        chunks = np.array_split(seeds, min(k, max_workers or os.cpu_count() or 1))
+        futures = [executor.submit(run_batch, difficulty, a, h, r, chunk.tolist())
+                   for chunk in chunks]
+        for fut in as_completed(futures):
+            for x in fut.result():
+                n += 1
+                delta = x - mean
+                mean += delta / n
+                m2 += delta * (x - mean)
+        if n >= min_sim and 1.96 * np.sqrt(m2 / (n - 1) / n) < tol:
+            break
+    variance = m2 / (n - 1) if n > 1 else 0.0
+    return mean, variance, n
 
 
 def run_baseline_experiment(n_sim=1000, max_workers=None):
@@ -93,7 +273,10 @@ def run_baseline_experiment(n_sim=1000, max_workers=None):
         for name, (a, h, r) in conditions.items():
             print(f"Running: difficulty={difficulty}, {name}")
 
-            base_seed = 10_000_000 + difficulty * 10_000 + hash(name) % 10_000
+            # common random numbers: every condition at a difficulty reuses the
+            # same seeds, so condition comparisons share their noise (and hash()
+            # randomization no longer makes the seeds irreproducible)
+            base_seed = 10_000_000 + difficulty * 10_000
 
             scores = run_parallel(
                 difficulty=difficulty,
@@ -114,10 +297,12 @@ def run_baseline_experiment(n_sim=1000, max_workers=None):
     return results
 
 
-def coarse_grid_sweep(difficulty=1, n_sim=200, max_workers=None):
+def coarse_grid_sweep(difficulty=1, n_sim=200, max_workers=None, tol=None):
     """
     Coarse grid sweep of (artillery, helipad, recon) resources in steps of 5,
-    where a + h + r = 50. Runs n_sim simulations per combination.
+    where a + h + r = 50. Runs n_sim simulations per combination; pass tol to
+    stop each combination early once its mean is pinned down to that CI
+    half-width (n_sim then acts as the cap).
     Saves results to pickle and prints top 10 combos by mean score.
     """
     resource_values = list(range(0, 51, 5))
@@ -127,8 +312,21 @@ def coarse_grid_sweep(difficulty=1, n_sim=200, max_workers=None):
 
     results = {}
 
+    # common random numbers: one fixed seed list shared by every (a, h, r), so
+    # the noise cancels when combos are compared instead of adding up
+    base_seed = 1_000_000
     for a,h,r in tqdm(combos, desc="Grid Sweep"):
-        base_seed = 1_000_000 + a*1000 + h*100 + r*10
+        if tol is not None:
+            mean, variance, n_used = run_adaptive(
+                difficulty, a, h, r, base_seed, n_sim, tol,
+                max_workers=max_workers
+            )
+            results[(a,h,r)] = {
+                "mean": mean,
+                "variance": variance,
+                "n": n_used
+            }
+            continue
         scores = run_parallel(
             difficulty=difficulty,
             a=a,
@@ -164,28 +362,63 @@ def simulated_annealing(
     """
     rng = np.random.default_rng(seed)
     cache = {}
+    disk = DiskCache()
+
+    # common random numbers: every state is evaluated on the same seeds so
+    # neighbor comparisons share their noise
+    base_seed = 999_000
 
     def energy(state):
-        if state in cache:
-            return -cache[state]
-        a, h, r = state
-        base_seed = 999_000 + a*1000 + h*100 + r*10
-        scores = run_parallel(difficulty, a, h, r, base_seed, n_sim, max_workers)
-        mean_score = scores.mean()
-        cache[state] = mean_score
-        return -mean_score  # negative for minimization
+        return energies([state])[0]
+
+    def energies(states):
+        """
+        Evaluates several states at once: cached ones resolve from memory or
+        disk, the rest go to the pool as a single state x seed workload so an
+        SA step's wall clock is the max over its neighbors, not the sum.
+        """
+        missing = []
+        for state in dict.fromkeys(states):
+            if state in cache:
+                continue
+            score = disk.get((difficulty, n_sim) + state)
+            if score is None:
+                missing.append(state)
+            else:
+                cache[state] = score
+        if missing:
+            executor = _get_pool(max_workers)
+            seeds = [base_seed + k for k in range(n_sim)]
+            jobs = [(difficulty, a, h, r, s) for (a, h, r) in missing for s in seeds]
+            chunksize = max(1, len(jobs) // (4 * (max_workers or os.cpu_count() or 1)))
+            scores = np.fromiter(
+                executor.map(_run_single_star, jobs, chunksize=chunksize),
+                dtype=np.float64,
+                count=len(jobs)
+            ).reshape(len(missing), n_sim)
+            for state, mean in zip(missing, scores.mean(axis=1)):
+                score = float(mean)
+                disk.set((difficulty, n_sim) + state, score)
+                cache[state] = score
+        return [-cache[state] for state in states]  # negative for minimization
+
+    # the six possible one-unit moves: take a resource from i, give it to j
+    moves = [(i, j) for i in range(3) for j in range(3) if i != j]
 
     def generate_neighbors(state):
-        a, h, r = state
+        # sample distinct feasible moves without replacement — the old
+        # independent draws often collided (or no-opped at a zero coordinate),
+        # wasting whole simulation batches on duplicate states
+        values = np.array(state)
+        feasible = [(i, j) for i, j in moves if values[i] > 0]
+        picks = rng.choice(len(feasible), size=min(n_neighbors, len(feasible)), replace=False)
         neighbors = []
-        values = np.array([a, h, r])
-        for _ in range(n_neighbors):
-            idxs = rng.choice(3, size=2, replace=False)
+        for idx in picks:
+            i, j = feasible[idx]
             neighbor_values = values.copy()
-            if neighbor_values[idxs[0]] > 0:
-                neighbor_values[idxs[0]] -= 1
-                neighbor_values[idxs[1]] += 1
-            neighbors.append(tuple(neighbor_values))
+            neighbor_values[i] -= 1
+            neighbor_values[j] += 1
+            neighbors.append(tuple(int(v) for v in neighbor_values))
         return neighbors
 
     current = initial_state
@@ -197,7 +430,7 @@ def simulated_annealing(
 
     for iteration in tqdm(range(max_iter), desc="Simulated Annealing"):
         neighbors = generate_neighbors(current)
-        neighbor_energies = np.array([energy(n) for n in neighbors])
+        neighbor_energies = np.array(energies(neighbors))
         min_idx = neighbor_energies.argmin()
         next_state = neighbors[min_idx]
         next_energy = neighbor_energies[min_idx]
@@ -212,6 +445,7 @@ def simulated_annealing(
         T = max(T * alpha, T_min)
         progress.append((-best_energy, best))
 
+    disk.flush()
     return best, -best_energy, progress, cache
 
 
@@ -228,15 +462,50 @@ def gibbs_sampling(
     """
     rng = np.random.default_rng(seed)
     cache = {}
+    disk = DiskCache()
+
+    # common random numbers: all candidate states share one seed list so the
+    # conditional comparisons aren't swamped by independent sampling noise
+    base_seed = 999_000
 
     def mean_score(state):
-        if state in cache:
-            return cache[state]
-        a, h, r = state
-        base_seed = 999_000 + a*1000 + h*100 + r*10
-        scores = run_parallel(difficulty, a, h, r, base_seed, n_sim, max_workers)
-        cache[state] = scores.mean()
-        return cache[state]
+        return mean_scores([state])[0]
+
+    def mean_scores(states):
+        """
+        Evaluates a batch of candidate states, resolving cached ones and
+        submitting the rest as one state x seed workload. A single map over the
+        full Cartesian product keeps every worker busy, instead of up to 51
+        sequential run_parallel rounds per Gibbs sweep.
+        """
+        missing = []
+        for state in dict.fromkeys(states):
+            if state in cache:
+                continue
+            score = disk.get((difficulty, n_sim) + state)
+            if score is None:
+                missing.append(state)
+            else:
+                cache[state] = score
+        if missing:
+            executor = _get_pool(max_workers)
+            seeds = [base_seed + k for k in range(n_sim)]
+            jobs = [(difficulty, a, h, r, s) for (a, h, r) in missing for s in seeds]
+            chunksize = max(1, len(jobs) // (4 * (max_workers or os.cpu_count() or 1)))
+            scores = np.fromiter(
+                executor.map(_run_single_star, jobs, chunksize=chunksize),
+                dtype=np.float64,
+                count=len(jobs)
+            ).reshape(len(missing), n_sim)
+            for state, mean in zip(missing, scores.mean(axis=1)):
+                score = float(mean)
+                disk.set((difficulty, n_sim) + state, score)
+                cache[state] = score
+        return [cache[state] for state in states]
+
+    # scratch space for the conditional softmax: at most 51 candidates
+    # (0..50), reused across all 3 * n_iter calls instead of reallocating
+    probs_buf = np.empty(51)
 
     def sample_conditional(i, current_state):
         """
@@ -249,21 +518,21 @@ def gibbs_sampling(
 
         # Gibbs: choose all possible values for i, compute unnormalized probabilities
         candidates = []
-        probs = []
         for val in range(0, remaining + 1):
             new_state = list(current_state)
             new_state[i] = val
             candidates.append(tuple(new_state))
-            probs.append(mean_score(tuple(new_state)))
 
-        # convert mean scores to probabilities
-        probs = np.array(probs)
-        # normalize to probabilities (softmax)
-        exp_probs = np.exp(probs - probs.max())  # subtract max for stability
-        exp_probs /= exp_probs.sum()
+        # convert mean scores to probabilities (one batched evaluation),
+        # normalizing with an in-place softmax on the reused buffer
+        probs = probs_buf[:len(candidates)]
+        probs[:] = mean_scores(candidates)
+        np.subtract(probs, probs.max(), out=probs)  # subtract max for stability
+        np.exp(probs, out=probs)
+        probs /= probs.sum()
 
         # sample new value
-        chosen_idx = rng.choice(len(candidates), p=exp_probs)
+        chosen_idx = rng.choice(len(candidates), p=probs)
         return candidates[chosen_idx]
 
     current = initial_state
@@ -278,6 +547,7 @@ def gibbs_sampling(
     # find best allocation
     best_score, best_state = max(progress, key=lambda x: x[0])
 
+    disk.flush()
     return best_state, best_score, progress, cache
 
 
@@ -294,6 +564,8 @@ def load_results(filename="sim_data/baseline_results.pkl"):
 
 
 def plot_mean_scores(results, path):
+    import matplotlib.pyplot as plt  # lazy: keep it out of pool workers
+
     output_dir = Path(path)
     output_dir.mkdir(exist_ok=True)
     weapons = ["artillery_only", "helipad_only", "recon_only"]
@@ -320,6 +592,8 @@ def plot_mean_scores(results, path):
 
 
 def plot_score_distributions(results, path):
+    import matplotlib.pyplot as plt  # lazy: keep it out of pool workers
+
     output_dir = Path(path)
     output_dir.mkdir(exist_ok=True)
 
@@ -343,7 +617,8 @@ def plot_score_distributions(results, path):
             sd = np.sqrt(variance)
             ax.hist(scores, bins=30, color=colors[weapon], density=True)
             x = np.linspace(scores.min(), scores.max(), 200)
-            y = norm.pdf(x, loc=mean, scale=sd)
+            # closed-form normal pdf; not worth importing scipy for
+            y = np.exp(-0.5 * ((x - mean) / sd) ** 2) / (sd * np.sqrt(2 * np.pi))
             ax.plot(x, y, 'k--', linewidth=2, label=f'Normal approx.\nμ={mean:.2f}, σ={sd:.2f}')
             ax.set_title(f"{weapon}, Difficulty {difficulty}")
             ax.set_xlabel("Score")
@@ -365,20 +640,19 @@ def plot_sa_trajectory(progress, path="sa_trajectory_freq.png"):
         progress: list of tuples (mean_score, (a, h, r))
         path: path to save the plot
     """
-    # Extract allocations and scores
-    allocations = [tuple(p[1]) for p in progress]
-    mean_scores = [p[0] for p in progress]
+    import matplotlib.pyplot as plt  # lazy: keep it out of pool workers
 
-    # Count frequency of each coordinate
-    freq_counter = Counter(allocations)
+    # Extract allocations and scores
+    alloc_arr = np.array([p[1] for p in progress])
+    scores_arr = np.array([p[0] for p in progress], dtype=np.float64)
 
-    # Unique coordinates
-    unique_coords = np.array(list(freq_counter.keys()))
-    freq = np.array([freq_counter[coord] for coord in freq_counter.keys()])
+    # unique coordinates, visit counts, and back-references in one vectorized call
+    unique_coords, inv, freq = np.unique(
+        alloc_arr, axis=0, return_inverse=True, return_counts=True
+    )
 
-    # Find mean score for each unique coordinate
-    score_dict = {alloc: score for score, alloc in progress}
-    mean_scores_unique = np.array([score_dict[tuple(coord)] for coord in unique_coords])
+    # mean score for each unique coordinate
+    mean_scores_unique = np.bincount(inv, weights=scores_arr) / freq
 
     a_vals = unique_coords[:, 0]
     h_vals = unique_coords[:, 1]
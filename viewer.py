@@ -0,0 +1,470 @@
+import heapq
+import threading
+import time
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QTextEdit, QPushButton, QLabel, QFrame, QHBoxLayout
+)
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QPixmap, QImage, QTextCursor
+from PIL import Image
+import re
+from pieces import Helicopter, Target, RWTarget
+from facilities import Artillery, ReconPlane
+from ui import EndGameEvent, ui_event_bridge
+import numpy as np
+PLAYBACK_SPEED = 4.0
+# effect durations in wall-clock ms, scaled once instead of per effect
+_ARTILLERY_MS = int(1000 / PLAYBACK_SPEED)
+_RECON_MS = _ARTILLERY_MS
+_HIT_MS = int(3000 / PLAYBACK_SPEED)
+ARTILLERY_COLOR = "#db3434"
+HELICOPTER_COLOR = "#cdd331"
+RECON_PLANE_COLOR = "#1818C3"
+TARGET_COLOR = "#000000"
+RW_TARGET_COLOR = "#666666"
+HIT_COLOR ="#25BB00"
+# compiled once: display_event runs this against every event message.
+# The bound search skips re's pattern-cache lookup on each call.
+_POS_SEARCH = re.compile(r"\((-?\d+),\s*(-?\d+)\)").search
+
+
+def _hex_to_rgb(color):
+    if color == "white":
+        return (255, 255, 255)
+    return (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+
+
+# The palette is fixed, so decode every color once at import instead of
+# re-parsing hex digits on each cell paint.
+_RGB = {
+    c: _hex_to_rgb(c)
+    for c in (ARTILLERY_COLOR, HELICOPTER_COLOR, RECON_PLANE_COLOR,
+              TARGET_COLOR, RW_TARGET_COLOR, HIT_COLOR, "white")
+}
+
+# effect name -> color, replacing the if/elif ladder in remove_cell_effect
+_EFFECT_COLOR = {
+    "target_hit": HIT_COLOR,
+    "artillery": ARTILLERY_COLOR,
+    "helicopter": HELICOPTER_COLOR,
+    "recon": RECON_PLANE_COLOR,
+    "rw_target": RW_TARGET_COLOR,
+    "target": TARGET_COLOR,
+}
+EFFECT_PRIORITY = {
+    "none": 0,
+    "target": 1,
+    "rw_target": 1,
+    "helicopter": 2,
+    "recon": 2,
+    "artillery": 3,
+    "target_hit": 4,
+}
+# bound once: the effect methods look priorities up on every cell update
+_PRIORITY_GET = EFFECT_PRIORITY.get
+
+
+class GameViewer(QWidget):
+    def __init__(self, engine, save=False):
+        super().__init__()
+        self.setWindowTitle("Stochastic Game — Real-Time Event Viewer")
+        self.setGeometry(200, 200, 700, 700)
+        self.setWindowFlag(Qt.WindowStaysOnTopHint, True)
+        self.engine = engine
+        self.engine_size = engine.size
+        self.save = save
+        if self.save:
+            self.capture_frames = []
+            self.capture_interval = 0.1
+            self.last_capture_time = time.time()
+
+        layout = QVBoxLayout()
+        self.status_label = QLabel("Waiting for game to begin...")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.status_label)
+
+        # -------- Grid setup --------
+        self.grid_size = self.engine_size * 2 + 1
+        self.cell_size = max(1, min(25, 500 // self.grid_size))
+        self.grid_frame = QFrame()
+        self.grid_frame.setFixedSize(self.grid_size*self.cell_size, self.grid_size*self.cell_size)
+        self.grid_frame.setStyleSheet("background-color: white;")
+        grid_container = QHBoxLayout()
+        grid_container.addStretch()
+        grid_container.addWidget(self.grid_frame)
+        grid_container.addStretch()
+        layout.addLayout(grid_container)
+        self.last_helicopter_positions = {}
+        self.last_rw_target_positions = {}
+        self._drawn_static_targets = set()
+
+        # One image-backed label instead of grid_size^2 QLabel widgets: the
+        # QImage reads straight out of the numpy buffer, so painting a cell is
+        # an array store plus one pixmap refresh
+        self._buf = np.full((self.grid_size, self.grid_size, 3), 255, dtype=np.uint8)
+        self._img = QImage(self._buf.data, self.grid_size, self.grid_size,
+                           3 * self.grid_size, QImage.Format_RGB888)
+        self.grid_label = QLabel(self.grid_frame)
+        self.grid_label.setFixedSize(self.grid_frame.width(), self.grid_frame.height())
+        self.grid_label.move(0, 0)
+        self._grid_dirty = False
+        self._refresh_grid()
+        # flat per-cell effect state indexed gy * grid_size + gx, so the hot
+        # paths do one integer index instead of hashing a coordinate tuple
+        self.cell_effects = [None] * (self.grid_size * self.grid_size)
+        # timed effects expire via one heap sweep per tick, not a QTimer each:
+        # (due_time, seq, gx, gy, effect_name)
+        self._reset_heap = []
+        self._reset_count = 0
+
+        # -------- Event log --------
+        self.text_box = QTextEdit()
+        self.text_box.setReadOnly(True)
+        self.text_box.setFixedHeight(200)  # smaller height at bottom
+        # log-only widget: skip undo-stack bookkeeping on every append
+        self.text_box.setUndoRedoEnabled(False)
+        # drop the oldest lines past 500 so memory and append cost stay
+        # bounded no matter how long the game runs
+        self.text_box.document().setMaximumBlockCount(500)
+        layout.addWidget(self.text_box)
+        # event lines buffered here and flushed as one append per tick
+        self._log_batch = []
+
+        self.overlay_label = QLabel(self.grid_frame)  # make it a child of grid_frame
+        self.overlay_label.setAlignment(Qt.AlignCenter)
+        self.overlay_label.setStyleSheet("""
+            background-color: rgba(0, 0, 0, 180);
+            color: white;
+            font-size: 18px;
+            padding: 10px;
+        """)
+        self.overlay_label.setVisible(False)
+        self.overlay_label.setWordWrap(True)  # allow multi-line text
+
+        # Set initial size to cover the grid
+        self.overlay_label.setFixedSize(self.grid_frame.width(), self.grid_frame.height())
+        self.overlay_label.move(0, 0)  # top-left of grid_frame
+        self.overlay_label.raise_()
+
+        self.close_button = QPushButton("Close")
+        self.close_button.clicked.connect(self.close)
+        layout.addWidget(self.close_button)
+        self.setLayout(layout)
+
+        # Event queue and signal: a min-heap keyed by event time, so the tick
+        # handler pops due events from the front instead of scanning the list
+        ui_event_bridge.subscribe(self.queue_event)
+        self.event_queue = []
+        self._event_count = 0
+        self.start_time = None
+
+        # Timer to periodically check queue. Coarse precision is plenty for a
+        # 50 ms playback tick and avoids keeping the OS timer resolution high.
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.setInterval(50)
+        self.timer.timeout.connect(self._on_tick)
+        self.timer.start()
+        self.targets_hit = 0
+
+        # concrete piece type -> grid handler, consulted once per event
+        self._piece_handlers = {
+            Artillery: self._handle_artillery,
+            Helicopter: self._handle_helicopter,
+            ReconPlane: self._handle_recon,
+            Target: self._handle_target,
+            RWTarget: self._handle_target,
+        }
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Keep overlay covering the grid
+        self.overlay_label.setFixedSize(self.grid_frame.width(), self.grid_frame.height())
+        self.overlay_label.move(0, 0)
+
+    def queue_event(self, events):
+        """Receive a batch of events from the engine and queue them for timed display."""
+        count = self._event_count
+        queue = self.event_queue
+        for event in events:
+            count += 1  # tiebreaker keeps heapq off the event objects
+            heapq.heappush(queue, (event.time, count, event))
+        self._event_count = count
+        if self.start_time is None:
+            self.start_time = time.time()
+
+    def _on_tick(self):
+        """Display queued events according to their timestamp and playback speed."""
+        # one sweep expires every due timed effect
+        now = time.time()
+        heap = self._reset_heap
+        while heap and heap[0][0] <= now:
+            _, _, gx, gy, name = heapq.heappop(heap)
+            self.remove_cell_effect(gx, gy, name)
+
+        if self.event_queue and self.start_time is not None:
+            elapsed = (time.time() - self.start_time) * PLAYBACK_SPEED
+            queue = self.event_queue
+            display = self.display_event
+            pop = heapq.heappop
+            while queue and queue[0][0] <= elapsed:
+                display(pop(queue)[2])
+        self._refresh_targets()
+        if self._log_batch:
+            # one append and one cursor move per tick, however many events fired
+            self.text_box.append("\n".join(self._log_batch))
+            self._log_batch.clear()
+            self.text_box.moveCursor(QTextCursor.End)
+        if self._grid_dirty:
+            self._refresh_grid()
+        if self.save:
+            now = time.time()
+            if now - self.last_capture_time >= self.capture_interval:
+                self.capture_grid_frame()
+                self.last_capture_time = now
+
+    def capture_grid_frame(self):
+        """Capture the current grid_frame as a PIL Image (PySide6 compatible)."""
+        pixmap = QPixmap(self.grid_frame.size())
+        self.grid_frame.render(pixmap)
+
+        # Convert to RGBA format
+        qimage = pixmap.toImage().convertToFormat(QImage.Format_RGBA8888)
+
+        width = qimage.width()
+        height = qimage.height()
+        ptr = qimage.constBits()  # memoryview
+        arr = ptr.tobytes()        # convert memoryview -> bytes
+
+        img = Image.frombytes("RGBA", (width, height), arr)
+        self.capture_frames.append(img)
+
+    def save_gif(self, filename="grid_animation.gif", duration_ms=100):
+        """Save captured frames as an animated GIF."""
+        if not self.capture_frames:
+            print("No frames captured for GIF.")
+            return
+        self.capture_frames[0].save(
+            filename,
+            save_all=True,
+            append_images=self.capture_frames[1:],
+            duration=duration_ms,
+            loop=0
+        )
+        print(f"Saved GIF to {filename}")
+        self.save = False
+
+    def _extract_and_clamp_coords(self, msg):
+        """
+        Extracts coordinates from the message attached to the event.
+        """
+        m = _POS_SEARCH(msg)
+        if not m:
+            return None
+        return self._clamp_coords((int(m.group(1)), int(m.group(2))))
+
+    def _event_coords(self, event):
+        """
+        Returns the clamped grid coordinates an event refers to. The engine
+        stamps (x, y) on events at emit time, so parsing the message is only
+        a fallback for events that never carried coordinates.
+        """
+        x = getattr(event, 'x', None)
+        if x is not None:
+            return self._clamp_coords((x, event.y))
+        return self._extract_and_clamp_coords(event.msg)
+
+    def _clamp_coords(self, pos):
+        x, y = pos
+        # conditional-expression clamp: cheaper than nested max(min(...))
+        # calls, and in-range coordinates (the common case) take no branch body
+        gx = x + self.engine_size
+        gy = y + self.engine_size
+        hi = self.grid_size - 1
+        if not 0 <= gx <= hi:
+            gx = 0 if gx < 0 else hi
+        if not 0 <= gy <= hi:
+            gy = 0 if gy < 0 else hi
+        return gx, gy
+
+    def display_event(self, event):
+        """Append an event to the text box and update the grid if needed."""
+        if type(event) is EndGameEvent:
+            self._handle_end_game(event)
+            return
+
+        self._log_batch.append(str(event))
+        self.status_label.setText(f"Time: {event.time:.2f}/100\nTargets hit: {self.targets_hit}")
+
+        # one hash lookup on the concrete piece type instead of an
+        # isinstance ladder per event
+        handler = self._piece_handlers.get(type(event.piece))
+        if handler is not None:
+            handler(event)
+
+    def _handle_artillery(self, event):
+        coords = self._event_coords(event)
+        if coords:
+            gx, gy = coords
+            self.apply_cell_effect(
+                gx, gy,
+                "artillery",
+                ARTILLERY_COLOR,
+                _ARTILLERY_MS
+            )
+
+    def _handle_helicopter(self, event):
+        coords = self._event_coords(event)
+        if coords:
+            gx, gy = coords
+            if event.piece.id in self.last_helicopter_positions:
+                lx, ly = self.last_helicopter_positions[event.piece.id]
+                self.remove_cell_effect(lx, ly, "helicopter")
+            self.apply_cell_effect(
+                gx, gy,
+                "helicopter",
+                HELICOPTER_COLOR
+            )
+            self.last_helicopter_positions[event.piece.id] = (gx, gy)
+
+    def _handle_recon(self, event):
+        coords = self._event_coords(event)
+        if coords:
+            gx, gy = coords
+            self.apply_cell_effect(
+                gx, gy,
+                "recon",
+                RECON_PLANE_COLOR,
+                _RECON_MS
+            )
+
+    def _handle_target(self, event):
+        if "destroyed by" in event.msg:
+            self.targets_hit += 1
+            gx, gy = self._clamp_coords(event.piece.get_pos())
+
+            self.apply_cell_effect(
+                gx, gy,
+                "target_hit",
+                HIT_COLOR,
+                _HIT_MS
+            )
+            if isinstance(event.piece, RWTarget):
+                # Also remove tracking for moving targets
+                if event.piece.id in self.last_rw_target_positions:
+                    del self.last_rw_target_positions[event.piece.id]
+                self.remove_cell_effect(gx, gy, "rw_target")
+            else:
+                self.remove_cell_effect(gx, gy, "target")
+
+    def _handle_end_game(self, event):
+        overlay_text = f"Game ended! Points: {self.engine.points}/{self.engine.possible_points}\n"
+        for f in self.engine.facilities.values():
+            if f.active():
+                overlay_text += f"{type(f).__name__} {f.id} earned {f.earned_points} points ({f.earned_points/f.resources:.2f} per resource)\n"
+
+        self.overlay_label.setText(overlay_text)
+        self.overlay_label.setVisible(True)
+        self.overlay_label.raise_()
+        if self.save:
+            # the (msec, TimerType, callable) overload is not exposed by this
+            # PySide6 build; a single precise shot at game end is harmless
+            QTimer.singleShot(100, lambda: self.save_gif("sim_output/grid_animation.gif", duration_ms=100))
+
+    def _refresh_targets(self):
+        """
+        Repaints target cells that changed since the last tick. Static targets
+        are drawn once; moving targets are repainted only when they crossed
+        into a new grid cell. Runs once per timer tick rather than per event.
+        """
+        for p in self.engine.pieces.values():
+            if p.active and p.target:
+                gx, gy = self._clamp_coords(p.get_pos())
+                piece_id = p.id
+
+                if isinstance(p, RWTarget):
+                    last = self.last_rw_target_positions.get(piece_id)
+                    if last == (gx, gy):
+                        continue
+                    if last is not None:
+                        self.remove_cell_effect(last[0], last[1], "rw_target")
+                    self.apply_cell_effect(
+                        gx, gy,
+                        "rw_target",
+                        RW_TARGET_COLOR
+                    )
+                    self.last_rw_target_positions[piece_id] = (gx, gy)
+
+                elif isinstance(p, Target):
+                    if piece_id not in self._drawn_static_targets:
+                        self._drawn_static_targets.add(piece_id)
+                        self.apply_cell_effect(
+                            gx, gy,
+                            "target",
+                            TARGET_COLOR
+                        )
+
+    def apply_cell_effect(self, gx, gy, effect_name, color, duration_ms=None):
+        idx = gy * self.grid_size + gx
+        cell = self.cell_effects[idx]
+        if cell is None:
+            cell = self.cell_effects[idx] = {"active": {}, "current": "none"}
+
+        cell["active"][effect_name] = True
+
+        if _PRIORITY_GET(effect_name, 0) >= _PRIORITY_GET(cell["current"], 0):
+            self._set_cell(gx, gy, color)
+            cell["current"] = effect_name
+
+        if duration_ms is not None:
+            # scheduled for the tick sweep; a counter breaks due-time ties so
+            # heapq never compares the payload
+            self._reset_count += 1
+            heapq.heappush(
+                self._reset_heap,
+                (time.time() + duration_ms / 1000.0, self._reset_count, gx, gy, effect_name)
+            )
+
+    def remove_cell_effect(self, gx, gy, effect_name):
+        cell = self.cell_effects[gy * self.grid_size + gx]
+        if cell is None:
+            return
+        cell["active"][effect_name] = False
+
+        if effect_name != cell["current"]:
+            # a lower-priority effect ended; what is on screen is unchanged
+            return
+
+        # the top effect ended, so recompute the highest remaining one
+        remaining = [name for name, active in cell["active"].items() if active]
+
+        if not remaining:
+            # revert to white
+            self._set_cell(gx, gy, "white")
+            cell["current"] = "none"
+            return
+
+        best = max(remaining, key=_PRIORITY_GET)
+        cell["current"] = best
+
+        self._set_cell(gx, gy, _EFFECT_COLOR.get(best, "white"))
+
+    def _set_cell(self, gx, gy, color):
+        """Paints one logical cell into the image buffer and marks the view dirty."""
+        self._buf[gy, gx] = _RGB[color]
+        self._grid_dirty = True
+
+    def _refresh_grid(self):
+        # one pixmap rebuild per tick, no matter how many cells changed
+        self.grid_label.setPixmap(QPixmap.fromImage(self._img).scaled(
+            self.grid_frame.width(), self.grid_frame.height()
+        ))
+        self._grid_dirty = False
+
+    def start_game(self, engine):
+        """Run the simulation in a background thread."""
+        try:
+            thread = threading.Thread(target=engine.run, daemon=True)
+            thread.start()
+        except:
+            pass